@@ -16,20 +16,86 @@ Features:
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import subprocess
 import os
-from datetime import datetime
 import signal
 import sys
 import argparse
+import re
+import queue
+import threading
+import socket
+import random
+import atexit
+
+# Use the fastest available JSON parser, falling back to the standard library
+try:
+    from orjson import loads as _loads
+except ImportError:
+    try:
+        from ujson import loads as _loads
+    except ImportError:
+        from json import loads as _loads
+
+try:
+    from orjson import dumps as _dumps
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj).encode('utf-8')
 
 # Configuration
 API_URL = "https://data-asg.goldprice.org/dbXRates/MYR"
 PRICE_THRESHOLD = 2.0  # RM per gram
 CHECK_INTERVAL = 25  # Check every 25 seconds
+MAX_BACKOFF = 300  # Longest wait between retries after failed fetches (seconds)
 PRICE_HISTORY_FILE = os.path.expanduser("~/.gold_price_history.json")
+PERSIST_INTERVAL = 600  # Write price history to disk at most every 10 minutes
+_OZ_TO_GRAM = 1.0 / 31.1035  # 1 troy ounce = 31.1035 grams
+
+# Pulls the first xauPrice straight out of the raw response bytes
+_XAU_PRICE_RE = re.compile(rb'"xauPrice"\s*:\s*([-+0-9.eE]+)')
+
+# AppleScript that takes the message and title as arguments, so no quote escaping is needed
+NOTIFICATION_SCRIPT = 'on run argv\n display notification item 1 of argv with title item 2 of argv\nend run'
+
+class NoDelayAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that disables Nagle's algorithm and enables TCP keep-alive on its sockets.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = [
+            (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+# Shared HTTP session so the TLS connection to the API is kept alive across polls
+_SESSION = requests.Session()
+_SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip',
+    'Connection': 'keep-alive'
+})
+_SESSION.mount('https://', NoDelayAdapter(pool_connections=1, pool_maxsize=2))
+
+# Validators from the last successful response, so unchanged feeds come back as 304 Not Modified
+_etag = None
+_last_modified = None
+_cached_price = (None, None)
+
+# Notifications are sent from a background thread so osascript never stalls the polling loop
+_notify_q = queue.Queue(maxsize=32)
+
+# Set by the signal handler to stop the monitoring loop
+_stop = threading.Event()
+
+# Price history is kept in memory and only written to disk periodically and on shutdown
+_dirty = False
+_pending_history = (None, None)
+_last_persist = -PERSIST_INTERVAL  # So the first reading is written straight away
 
 def get_gold_price():
     """
@@ -38,26 +104,38 @@ def get_gold_price():
     1 troy ounce = 31.1035 grams
     
     Returns a tuple of (price_per_gram, timestamp) or (None, None) if failed.
+    The timestamp is a Unix epoch float from time.time().
     """
+    global _etag, _last_modified, _cached_price
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
-        }
-        response = requests.get(API_URL, headers=headers, timeout=10)
-        response.raise_for_status()
+        headers = {}
+        if _etag:
+            headers['If-None-Match'] = _etag
+        if _last_modified:
+            headers['If-Modified-Since'] = _last_modified
         
-        data = response.json()
+        # Closing the response returns the connection to the session's pool right away
+        with _SESSION.get(API_URL, headers=headers, timeout=10) as response:
+            if response.status_code == 304:
+                # Feed hasn't changed since the last fetch
+                return _cached_price
+            response.raise_for_status()
+            
+            # Extract the gold price in RM per troy ounce without decoding the whole payload
+            match = _XAU_PRICE_RE.search(response.content)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
         
-        # Extract the gold price in RM per troy ounce
-        if 'items' in data and len(data['items']) > 0:
-            item = data['items'][0]
-            price_per_oz = item.get('xauPrice')
+        if match:
+            price_per_oz = float(match.group(1))
             
             if price_per_oz:
                 # Convert from RM per troy ounce to RM per gram
-                price_per_gram = price_per_oz / 31.1035
-                timestamp = datetime.now().isoformat()
-                return price_per_gram, timestamp
+                price_per_gram = price_per_oz * _OZ_TO_GRAM
+                _cached_price = (price_per_gram, time.time())
+                _etag = etag
+                _last_modified = last_modified
+                return _cached_price
         
         return None, None
     except Exception as e:
@@ -79,16 +157,9 @@ def send_notification(title, message, verbose=False):
             print(f"   Title: {title}")
             print(f"   Message: {message}\n")
         
-        # Escape quotes in the message and title
-        message_escaped = message.replace('"', '\\"').replace("'", "\\'")
-        title_escaped = title.replace('"', '\\"').replace("'", "\\'")
-        
-        # Build the osascript command
-        script = f'display notification "{message_escaped}" with title "{title_escaped}"'
-        
-        # Execute the notification
+        # Execute the notification (message and title are passed as argv)
         result = subprocess.run(
-            ['osascript', '-e', script],
+            ['osascript', '-e', NOTIFICATION_SCRIPT, message, title],
             check=False,
             capture_output=True,
             timeout=5,
@@ -114,32 +185,108 @@ def send_notification(title, message, verbose=False):
         print(f"❌ Error sending notification: {e}")
         return False
 
+def _notify_worker():
+    """
+    Send queued notifications one at a time (runs on a daemon thread).
+    A None item tells the worker to stop.
+    """
+    while True:
+        item = _notify_q.get()
+        if item is None:
+            _notify_q.task_done()
+            return
+        title, message, verbose = item
+        send_notification(title, message, verbose=verbose)
+        _notify_q.task_done()
+
+def drain_notifications(worker, timeout=5):
+    """
+    Let the worker send any queued notifications before shutdown, waiting at most timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        _notify_q.put(None, timeout=timeout)
+    except queue.Full:
+        print("⚠️  Notification queue still full at shutdown")
+        return
+    worker.join(max(0, deadline - time.monotonic()))
+    if worker.is_alive():
+        print("⚠️  Timed out sending pending notifications")
+
+def queue_notification(title, message, verbose=False):
+    """
+    Queue a notification for the background worker, dropping the oldest one if the queue is full.
+    """
+    item = (title, message, verbose)
+    try:
+        _notify_q.put_nowait(item)
+    except queue.Full:
+        try:
+            _notify_q.get_nowait()
+            _notify_q.task_done()
+        except queue.Empty:
+            pass
+        try:
+            _notify_q.put_nowait(item)
+        except queue.Full:
+            print("⚠️  Notification queue full, dropping alert")
+
 def load_price_history():
     """
     Load the price history from file.
     """
-    if os.path.exists(PRICE_HISTORY_FILE):
-        try:
-            with open(PRICE_HISTORY_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"⚠️  Error loading price history: {e}")
+    try:
+        with open(PRICE_HISTORY_FILE, 'rb') as f:
+            return _loads(f.read())
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Error loading price history: {e}")
     return {"last_price": None, "last_timestamp": None}
 
 def save_price_history(price, timestamp):
     """
     Save the price history to file.
+    Writes to a temporary file and renames it so the history is never left half-written.
     """
     try:
-        history = {
+        payload = _dumps({
             "last_price": price,
             "last_timestamp": timestamp
-        }
-        with open(PRICE_HISTORY_FILE, 'w') as f:
-            json.dump(history, f, indent=2)
+        })
+        tmp_file = PRICE_HISTORY_FILE + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, PRICE_HISTORY_FILE)
     except Exception as e:
         print(f"⚠️  Error saving price history: {e}")
 
+def update_price_history(price, timestamp):
+    """
+    Record a new reference price in memory; it is written to disk by flush_price_history.
+    """
+    global _dirty, _pending_history
+    _pending_history = (price, timestamp)
+    _dirty = True
+
+def flush_price_history(force=False):
+    """
+    Write the in-memory price history to disk if it changed and PERSIST_INTERVAL has passed.
+    
+    Args:
+        force: Write immediately regardless of the interval (used on shutdown)
+    """
+    global _dirty, _last_persist
+    if not _dirty:
+        return
+    if not force and time.monotonic() - _last_persist < PERSIST_INTERVAL:
+        return
+    save_price_history(*_pending_history)
+    _dirty = False
+    _last_persist = time.monotonic()
+
 def format_notification_message(current_price, previous_price):
     """
     Format the notification message with NOW vs THEN format.
@@ -176,10 +323,9 @@ def test_notification():
 
 def signal_handler(sig, frame):
     """
-    Handle Ctrl+C gracefully.
+    Handle Ctrl+C gracefully by waking up and stopping the monitoring loop.
     """
-    print("\n\n⏹️  Gold price monitor stopped.")
-    sys.exit(0)
+    _stop.set()
 
 def main(test_mode=False, verbose=False, interval=None, threshold=None):
     """
@@ -214,53 +360,104 @@ def main(test_mode=False, verbose=False, interval=None, threshold=None):
     
     # Set up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    # Save pending history even if main exits through an exception
+    atexit.register(flush_price_history, True)
+    
+    # Start the notification worker
+    notify_thread = threading.Thread(target=_notify_worker, daemon=True)
+    notify_thread.start()
     
     # Load initial price history
     history = load_price_history()
     last_price = history.get("last_price")
     
+    # Compare prices in whole sen (0.01 RM) to keep the threshold check exact
+    # (at least 1 sen, so an unchanged price never counts as a change)
+    threshold_cents = max(1, round(PRICE_THRESHOLD * 100))
+    last_price_cents = round(last_price * 100) if last_price is not None else None
+    
     iteration = 0
+    next_deadline = time.monotonic()
+    backoff = CHECK_INTERVAL
     
-    while True:
+    while not _stop.is_set():
+        # Persist the price history if it's due
+        flush_price_history()
+        
+        # Wait until the next scheduled check so the cadence doesn't drift with fetch time
+        delay = next_deadline - time.monotonic()
+        if delay > 0:
+            if _stop.wait(delay):
+                break
+        else:
+            # Fell behind (or first check) - don't try to catch up
+            next_deadline = time.monotonic()
+        next_deadline += CHECK_INTERVAL
+        
         iteration += 1
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        current_time = time.strftime("%Y-%m-%d %H:%M:%S")
         
-        print(f"[{current_time}] Check #{iteration}...", end=" ", flush=True)
+        # Build the whole status line and write it in one go
+        parts = [f"[{current_time}] Check #{iteration}... "]
         
         # Fetch current price
         current_price, timestamp = get_gold_price()
         
+        # Stopped while fetching - don't record or alert on this check
+        if _stop.is_set():
+            break
+        
         if current_price is None:
-            print("❌ Failed to fetch price")
-            time.sleep(CHECK_INTERVAL)
+            # Back off exponentially (with a little jitter) while the API keeps failing
+            retry_delay = backoff + random.uniform(0, 2)
+            next_deadline = time.monotonic() + retry_delay
+            backoff = min(backoff * 2, max(MAX_BACKOFF, CHECK_INTERVAL))
+            
+            parts.append(f"❌ Failed to fetch price (retrying in {retry_delay:.0f}s)")
+            sys.stdout.write(''.join(parts) + '\n')
+            sys.stdout.flush()
             continue
         
-        print(f"Current price: {current_price:.2f} RM/g", end=" ")
+        backoff = CHECK_INTERVAL
+        parts.append(f"Current price: {current_price:.2f} RM/g ")
+        alert_message = None
         
         # Check if this is the first price or if there's a significant change
+        current_price_cents = round(current_price * 100)
         if last_price is not None:
-            price_change = abs(current_price - last_price)
+            delta_cents = current_price_cents - last_price_cents
+            change_cents = delta_cents if delta_cents >= 0 else -delta_cents
             
-            if price_change >= PRICE_THRESHOLD:
-                print(f"⚠️  CHANGE DETECTED: {price_change:.2f} RM/g")
-                
-                # Send notification
-                title = "💰 Gold Price Alert"
-                message = format_notification_message(current_price, last_price)
-                send_notification(title, message, verbose=verbose)
+            if change_cents >= threshold_cents:
+                parts.append(f"⚠️  CHANGE DETECTED: {change_cents / 100:.2f} RM/g")
+                # Use the same rounded prices as the comparison so the message matches the threshold
+                alert_message = format_notification_message(current_price_cents / 100, last_price_cents / 100)
                 
                 # Update history
-                save_price_history(current_price, timestamp)
+                update_price_history(current_price, timestamp)
                 last_price = current_price
+                last_price_cents = current_price_cents
             else:
-                print(f"(Change: {price_change:.2f} RM/g - below threshold)")
+                parts.append(f"(Change: {change_cents / 100:.2f} RM/g - below threshold)")
         else:
-            print("(First reading)")
-            save_price_history(current_price, timestamp)
+            parts.append("(First reading)")
+            update_price_history(current_price, timestamp)
             last_price = current_price
+            last_price_cents = current_price_cents
         
-        # Wait before next check
-        time.sleep(CHECK_INTERVAL)
+        sys.stdout.write(''.join(parts) + '\n')
+        sys.stdout.flush()
+        
+        # Send notification
+        if alert_message:
+            queue_notification("💰 Gold Price Alert", alert_message, verbose=verbose)
+    
+    # Send any queued alerts, then save pending history before exiting
+    drain_notifications(notify_thread)
+    flush_price_history(force=True)
+    print("\n\n⏹️  Gold price monitor stopped.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(